@@ -0,0 +1,70 @@
+import be.panako.cli.Panako;
+import be.panako.strategy.QueryResult;
+import be.panako.strategy.QueryResultHandler;
+import be.panako.strategy.Strategy;
+import be.panako.util.Config;
+import be.panako.util.Key;
+import be.tarsos.dsp.io.PipeDecoder;
+import be.tarsos.dsp.io.PipedAudioStream;
+
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.nio.charset.StandardCharsets;
+import java.util.HashSet;
+import java.util.Locale;
+
+/**
+ * Long-lived Panako query helper used by stream_monitor.py.
+ *
+ * Reads one audio path per line on stdin, prints the results the same way
+ * "panako query" does and terminates every answer with a QUERY_DONE line.
+ * Started with the Java source launcher, so no separate build step:
+ *
+ *   java -cp panako-2.1-all.jar PanakoQueryServer.java
+ */
+public class PanakoQueryServer {
+
+    static final String SENTINEL = "QUERY_DONE";
+
+    public static void main(String[] args) throws IOException {
+        Locale.setDefault(Locale.US);
+        if ("PIPE".equalsIgnoreCase(Config.get(Key.DECODER))) {
+            PipedAudioStream.setDecoder(new PipeDecoder(
+                    Config.get(Key.DECODER_PIPE_ENVIRONMENT),
+                    Config.get(Key.DECODER_PIPE_ENVIRONMENT_ARG),
+                    Config.get(Key.DECODER_PIPE_COMMAND),
+                    Config.get(Key.DECODER_PIPE_LOG_FILE),
+                    Config.getInt(Key.DECODER_PIPE_BUFFER_SIZE)));
+        }
+
+        Strategy strategy = Strategy.getInstance();
+        int maxResults = Config.getInt(Key.NUMBER_OF_QUERY_RESULTS);
+        QueryResultHandler handler = new QueryResultHandler() {
+            @Override
+            public void handleQueryResult(QueryResult result) {
+                Panako.printQueryResult(result);
+            }
+
+            @Override
+            public void handleEmptyResult(QueryResult result) {
+                Panako.printQueryResult(result);
+            }
+        };
+
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String path;
+        while ((path = in.readLine()) != null) {
+            if (path.isEmpty()) {
+                continue;
+            }
+            try {
+                strategy.query(path, maxResults, new HashSet<Integer>(), handler);
+            } catch (Exception e) {
+                System.out.println("QUERY ERROR " + e);
+            }
+            System.out.println(SENTINEL);
+            System.out.flush();
+        }
+    }
+}
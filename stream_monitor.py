@@ -1,82 +1,406 @@
 
 import sys
 import os
+import io
+import collections
+import ctypes
 import time
-import wave
+import queue
+import struct
 import threading
 import tempfile
 import subprocess
 import shlex
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from typing import Callable, Optional, List
 
+import ahocorasick
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QLineEdit, QPushButton, QTextEdit, QListWidget, QTabWidget, QFileDialog,
     QFormLayout, QSpinBox, QMessageBox, QCheckBox
 )
-from PySide6.QtCore import Qt, Signal, QObject
+from PySide6.QtCore import Qt, QTimer
+
+
+def wav_header(data_size: int, sample_rate: int, channels: int, sampwidth: int) -> bytes:
+    """44-byte PCM RIFF/WAVE header for data_size bytes of audio."""
+    return (b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVEfmt ' +
+            struct.pack('<IHHIIHH', 16, 1, channels, sample_rate,
+                        sample_rate * channels * sampwidth, channels * sampwidth, sampwidth * 8) +
+            b'data' + struct.pack('<I', data_size))
+
+_last_timestamp = (0, '')
+
+def log_timestamp() -> str:
+    """Local time as 'YYYY-MM-DD HH:MM:SS', formatted at most once per second."""
+    global _last_timestamp
+    sec = int(time.time())
+    if sec != _last_timestamp[0]:
+        _last_timestamp = (sec, datetime.fromtimestamp(sec).isoformat(sep=' ', timespec='seconds'))
+    return _last_timestamp[1]
+
+READ_CHUNK_BYTES = 64 * 1024
+# After a short read the pipe is empty; sleeping this long lets ffmpeg queue up a larger batch
+# for the next read instead of waking the loop for every packet it writes.
+READ_BATCH_SECONDS = 0.1
+PIPE_SIZE_BYTES = 1 << 20
+F_SETPIPE_SZ = 1031  # Linux only, missing from the fcntl module before Python 3.10
+
+def grow_pipe(fd: int, size: int = PIPE_SIZE_BYTES):
+    """Best effort: enlarge the kernel pipe buffer behind fd (Linux only)."""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return
+    try:
+        fcntl.fcntl(fd, getattr(fcntl, 'F_SETPIPE_SZ', F_SETPIPE_SZ), size)
+    except OSError:
+        pass
+
+class PcmRingBuffer:
+    """Fixed-size circular buffer holding the most recent `size` bytes of PCM."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.ring = np.empty(size, dtype=np.uint8)
+        self._view = memoryview(self.ring)
+        self.write_pos = 0
+        self.filled = 0
+
+    def fill_from(self, stream, max_bytes: int = READ_CHUNK_BYTES):
+        """
+        Do one readinto() from an unbuffered binary stream straight into the ring.
+        Reads stop at the end of the array; the next call continues at the start.
+        Returns (bytes read, short) where short means the read returned less than the
+        slice it asked for, i.e. the stream had no more data ready. bytes read is 0 at EOF.
+        """
+        end = min(self.write_pos + max_bytes, self.size)
+        n = stream.readinto(self._view[self.write_pos:end]) or 0
+        short = n < end - self.write_pos
+        self.write_pos = (self.write_pos + n) % self.size
+        self.filled = min(self.filled + n, self.size)
+        return n, short
+
+    def view_bytes(self) -> bytes:
+        """Return the buffered window, oldest byte first."""
+        if self.filled < self.size:
+            return self.ring[:self.filled].tobytes()
+        return np.concatenate((self.ring[self.write_pos:], self.ring[:self.write_pos])).tobytes()
+
+# Python creates its fds non-inheritable (PEP 446), so skipping the close_fds sweep is safe on Linux;
+# a new session keeps a Ctrl+C aimed at the GUI from also killing ffmpeg/java.
+CHILD_POPEN_KWARGS = {'close_fds': False, 'start_new_session': True} if sys.platform.startswith('linux') else {}
+
+def java_add_opens_args(add_opens: Optional[List[str]]) -> List[str]:
+    args = []
+    for ao in add_opens or []:
+        args += ['--add-opens', ao]
+    return args
+
+def run_panako_query(cmd_prefix: tuple, wav_path: str, timeout=30):
+    """One-shot query; cmd_prefix is (java_bin, *java args, '-jar', panako_jar, 'query'). Output is bytes."""
+    try:
+        result = subprocess.run([*cmd_prefix, wav_path], capture_output=True, timeout=timeout,
+                                **CHILD_POPEN_KWARGS)
+        return result.returncode, result.stdout + result.stderr
+    except subprocess.TimeoutExpired:
+        return 124, b'PANAKO QUERY TIMEOUT'
 
 
-def write_wav_from_pcm(pcm_bytes: bytes, out_path: str, sample_rate: int, channels: int, sampwidth: int):
-    with wave.open(out_path, 'wb') as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(sampwidth)
-        wf.setframerate(sample_rate)
-        wf.writeframes(pcm_bytes)
+QUERY_SERVER_SOURCE = Path(__file__).resolve().parent / 'PanakoQueryServer.java'
 
-def run_panako_query(java_bin: str, panako_jar: str, wav_path: str, extra_java_args: Optional[List[str]] = None, timeout=30):
-    cmd = [java_bin]
-    if extra_java_args:
-        cmd += extra_java_args
-    cmd += ['-jar', panako_jar, 'query', wav_path]
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-        out = (result.stdout or '') + (result.stderr or '')
-        return result.returncode, out
-    except subprocess.TimeoutExpired:
-        return 124, 'PANAKO QUERY TIMEOUT'
+class PanakoQueryServer:
+    """
+    Long-lived JVM answering Panako queries, so the JVM startup and DB open
+    are paid once per monitor run instead of once per check.
+
+    Each query writes a WAV path line to the helper's stdin and collects its
+    output up to the QUERY_DONE sentinel. Panako's query API only takes audio
+    paths, so the PCM window still goes through a file. Falls back to a
+    one-shot `java -jar panako query` when the helper cannot be started.
+    """
+    SENTINEL = b'QUERY_DONE'
+
+    def __init__(self, java_bin: str, panako_jar: str, extra_java_args: Optional[List[str]] = None,
+                 on_line: Callable[[str], None] = lambda s: None):
+        java_args = tuple(extra_java_args or ())
+        self.server_cmd = (java_bin,) + java_args + ('-cp', panako_jar, str(QUERY_SERVER_SOURCE))
+        self.query_cmd_prefix = (java_bin,) + java_args + ('-jar', panako_jar, 'query')
+        self.on_line = on_line
+        self._lock = threading.Lock()
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: Optional[queue.Queue] = None
+        self._served = False
+        self._closed = False
+        self._failed = not QUERY_SERVER_SOURCE.exists()
+
+    def _start(self):
+        self.on_line('Starting Panako query server: ' + ' '.join(shlex.quote(s) for s in self.server_cmd))
+        self._proc = subprocess.Popen(self.server_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.STDOUT, bufsize=0, **CHILD_POPEN_KWARGS)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(io.BufferedReader(self._proc.stdout), self._lines),
+                         daemon=True).start()
+
+    @staticmethod
+    def _pump(stream, lines: queue.Queue):
+        for raw in iter(stream.readline, b''):
+            lines.put(raw.rstrip(b'\r\n'))
+        lines.put(None)
+
+    def _fallback(self, wav_path: str, timeout):
+        return run_panako_query(self.query_cmd_prefix, wav_path, timeout=timeout)
+
+    def query(self, wav_path: str, timeout=30):
+        with self._lock:
+            if self._closed:
+                return 1, b'PANAKO QUERY SERVER CLOSED'
+            if self._failed:
+                return self._fallback(wav_path, timeout)
+            try:
+                if self._proc is None:
+                    self._start()
+                    if self._closed:
+                        # close() ran while the JVM was starting and found no process to stop
+                        self._stop_proc()
+                        return 1, b'PANAKO QUERY SERVER CLOSED'
+            except OSError as e:
+                self._stop_proc()
+                if not self._served:
+                    self._failed = True
+                    self.on_line(f"[PANAKO] query server unavailable ({e}), using one-shot queries")
+                return self._fallback(wav_path, timeout)
+            proc, lines = self._proc, self._lines
+            if proc is None:  # close() stopped the JVM since the check above
+                return 1, b'PANAKO QUERY SERVER CLOSED'
+            try:
+                proc.stdin.write((wav_path + '\n').encode('utf-8'))
+                sent = True
+            except OSError:
+                # the helper already exited; its output and exit code are collected below
+                sent = False
+
+            out = []
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    line = lines.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self._stop_proc()
+                    return 124, b'PANAKO QUERY TIMEOUT'
+                if line == self.SENTINEL:
+                    self._served = True
+                    return 0, b'\n'.join(out)
+                if line is None:
+                    rc = proc.wait()
+                    self._stop_proc()
+                    if not self._served and not self._closed:
+                        self._failed = True
+                        if out:
+                            # usually the javac error from the source launcher
+                            self.on_line(b'\n'.join(out).decode('utf-8', 'replace'))
+                        self.on_line(f"[PANAKO] query server exited ({rc}), using one-shot queries")
+                        return self._fallback(wav_path, timeout)
+                    if not sent and not self._closed:
+                        return self._fallback(wav_path, timeout)
+                    return rc, b'\n'.join(out)
+                out.append(line)
+
+    def _stop_proc(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            proc.terminate()
+        except Exception:
+            pass
+
+    def close(self):
+        """Stop the JVM without waiting for an in-flight query; that query returns early."""
+        self._closed = True
+        self._stop_proc()
+
+class OlafMatch(ctypes.Structure):
+    _fields_ = [
+        ('match_count', ctypes.c_int),
+        ('query_start', ctypes.c_float),
+        ('query_stop', ctypes.c_float),
+        ('reference_start', ctypes.c_float),
+        ('reference_stop', ctypes.c_float),
+        ('reference_path', ctypes.c_char * 512),
+    ]
+
+class OlafQueryBackend:
+    """
+    In-process queries through an Olaf shared library, skipping the JVM and the WAV file.
+
+    The library must export:
+      int olaf_query_init(const char *db_path);
+      int olaf_query(const int16_t *pcm, size_t n_samples, int sample_rate,
+                     OlafMatch *results, size_t max_results);
+    olaf_query returns the number of results written, or a negative value on error.
+    Audio must be mono s16.
+    """
+    MAX_RESULTS = 32
+
+    def __init__(self, db_path: str, lib_path: str = 'libolaf.so'):
+        self.lib = ctypes.CDLL(lib_path)
+        self.lib.olaf_query_init.argtypes = [ctypes.c_char_p]
+        self.lib.olaf_query_init.restype = ctypes.c_int
+        self.lib.olaf_query.argtypes = [ctypes.POINTER(ctypes.c_int16), ctypes.c_size_t, ctypes.c_int,
+                                        ctypes.POINTER(OlafMatch), ctypes.c_size_t]
+        self.lib.olaf_query.restype = ctypes.c_int
+        rc = self.lib.olaf_query_init(db_path.encode('utf-8'))
+        if rc != 0:
+            raise OSError(f"olaf_query_init failed ({rc}) for {db_path}")
+        self._results = (OlafMatch * self.MAX_RESULTS)()
+
+    def query(self, pcm: bytes, sample_rate: int) -> set:
+        """Return the file names of the references matching pcm."""
+        pcm16 = np.frombuffer(pcm, dtype=np.int16)
+        n = self.lib.olaf_query(pcm16.ctypes.data_as(ctypes.POINTER(ctypes.c_int16)), len(pcm16),
+                                sample_rate, self._results, self.MAX_RESULTS)
+        if n < 0:
+            raise OSError(f"olaf_query failed ({n})")
+        return {os.path.basename(self._results[i].reference_path.decode('utf-8', 'replace'))
+                for i in range(min(n, self.MAX_RESULTS))}
+
+def iter_mp3s(root: str):
+    """Yield (name, path) for every .mp3 file under root, without following directory symlinks."""
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name.endswith('.mp3'):
+                    yield e.name, e.path
+
+def is_silent(pcm: bytes, rms_threshold: float, stride: int = 16) -> bool:
+    """True if the RMS of the s16 PCM, estimated from every stride-th sample, is below rms_threshold."""
+    if rms_threshold <= 0:
+        return False
+    samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)[::stride].astype(np.int32)
+    if samples.size == 0:
+        return True
+    return (samples * samples).mean() < rms_threshold * rms_threshold
+
+def build_song_automaton(song_tokens: List[bytes], songs: List[str]):
+    """
+    Aho-Corasick automaton mapping each song token to (index, song name); None if there are no songs.
+
+    pyahocorasick only takes str keys, so byte tokens are stored latin-1 decoded (one char per byte);
+    scan output the same way: automaton.iter(out.decode('latin-1')).
+    """
+    if not song_tokens:
+        return None
+    automaton = ahocorasick.Automaton()
+    for i, (token, orig) in enumerate(zip(song_tokens, songs)):
+        automaton.add_word(token.decode('latin-1'), (i, orig))
+    automaton.make_automaton()
+    return automaton
+
+FFMPEG_RW_TIMEOUT_US = 15_000_000
+
+def build_ffmpeg_cmd(ffmpeg_bin: str, stream_url: str, sample_rate: int, channels: int) -> List[str]:
+    """ffmpeg command decoding stream_url to raw s16le on stdout with minimal input buffering."""
+    cmd = [
+        ffmpeg_bin,
+        '-fflags', 'nobuffer',
+        '-flags', 'low_delay',
+        '-probesize', '32',
+        '-analyzeduration', '0',
+        '-rtbufsize', '100M',
+    ]
+    scheme = stream_url.split('://', 1)[0].lower() if '://' in stream_url else ''
+    if scheme in ('rtsp', 'rtsps'):
+        cmd += ['-rtsp_transport', 'tcp']
+    elif scheme in ('http', 'https'):
+        cmd += ['-reconnect', '1', '-reconnect_streamed', '1', '-rw_timeout', str(FFMPEG_RW_TIMEOUT_US)]
+    cmd += [
+        '-i', stream_url,
+        '-vn',
+        '-ac', str(channels),
+        '-ar', str(sample_rate),
+        '-f', 's16le',
+        '-'
+    ]
+    return cmd
 
 def monitor_stream_loop(stream_url: str, songs_dir: str, panako_jar: str,
                         java_bin='java', ffmpeg_bin='ffmpeg',
-                        sample_rate=44100, channels=1, sampwidth=2,
+                        sample_rate=22050, channels=1, sampwidth=2,
                         window_seconds=25, overlap_seconds=5,
                         add_opens: Optional[List[str]] = None,
                         miss_threshold: int = 2,
+                        backend: str = 'panako',
+                        olaf_lib: str = 'libolaf.so',
+                        olaf_db: Optional[str] = None,
+                        no_match_sentinels=(b'; null ; null ;',),
+                        silence_rms_threshold: float = 200,
                         on_line: Callable[[str], None] = lambda s: None,
                         stop_event: threading.Event = None):
-    """Blocking monitor loop. Call in a background thread. Uses callbacks for output lines."""
+    """
+    Blocking monitor loop. Call in a background thread. Uses callbacks for output lines.
+
+    backend='olaf' queries in-process through OlafQueryBackend (olaf_lib, olaf_db) and
+    falls back to Panako if the library cannot be loaded or channels is not 1.
+
+    no_match_sentinels are lowercase byte strings that only appear in Panako output without a match
+    (Panako 2.1 prints null for the reference path and id of an empty result); the song name scan is
+    skipped when one is present.
+
+    Windows whose RMS is below silence_rms_threshold (s16 units, 0 disables) are not queried.
+    """
     if stop_event is None:
         stop_event = threading.Event()
 
-    extra_java_args = []
-    if add_opens:
-        for ao in add_opens:
-            extra_java_args += ['--add-opens', ao]
+    olaf = None
+    if backend == 'olaf' and channels != 1:
+        on_line(f"[OLAF ERROR] Olaf needs mono audio, got channels={channels}, falling back to Panako")
+    elif backend == 'olaf':
+        try:
+            olaf = OlafQueryBackend(olaf_db or '', olaf_lib)
+            on_line(f"Using Olaf backend: {olaf_lib}")
+        except (OSError, AttributeError) as e:
+            on_line(f"[OLAF ERROR] {e}, falling back to Panako")
+
+    extra_java_args = java_add_opens_args(add_opens)
 
     step_seconds = window_seconds - overlap_seconds
     bytes_per_second = sample_rate * channels * sampwidth
     window_bytes = window_seconds * bytes_per_second
+    step_bytes = step_seconds * bytes_per_second
 
-    songs = []
-    for p in Path(songs_dir).glob('**/*.mp3'):
-        songs.append(p.name)
+    songs = list(dict.fromkeys(name for name, _path in iter_mp3s(songs_dir)))
     if not songs:
         on_line(f"Warning: no MP3s found in {songs_dir}")
-    song_tokens = [s.lower() for s in songs]
+    song_tokens = [s.encode('utf-8', 'replace').lower() for s in songs]
+    song_index = {name: i for i, name in enumerate(songs)}
+    automaton = build_song_automaton(song_tokens, songs)
 
-    ffmpeg_cmd = [
-        ffmpeg_bin, '-i', stream_url,
-        '-vn',
-        '-ac', str(channels),
-        '-ar', str(sample_rate),
-        '-f', 's16le',
-        '-'
-    ]
+    ffmpeg_cmd = build_ffmpeg_cmd(ffmpeg_bin, stream_url, sample_rate, channels)
     on_line('Starting ffmpeg: ' + ' '.join(shlex.quote(s) for s in ffmpeg_cmd))
     try:
-        proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0,
+                                **CHILD_POPEN_KWARGS)
     except Exception as e:
         on_line(f"[FFMPEG ERROR] {e}")
         return
@@ -85,62 +409,105 @@ def monitor_stream_loop(stream_url: str, songs_dir: str, panako_jar: str,
         on_line("[FFMPEG ERROR] stdout not captured")
         return
 
-    buffer = bytearray()
-    last_check = time.time()
-    active = {}
+    grow_pipe(proc.stdout.fileno())
+    server = PanakoQueryServer(java_bin, panako_jar, extra_java_args=extra_java_args, on_line=on_line)
+    buffer = PcmRingBuffer(window_bytes)
+
+    window_header = wav_header(window_bytes, sample_rate, channels, sampwidth)
+    # One query file for the whole run, on tmpfs when available; queries never overlap.
+    with tempfile.NamedTemporaryFile(prefix='panako_q_', suffix='.wav', delete=False,
+                                     dir='/dev/shm' if os.path.isdir('/dev/shm') else None) as tf:
+        tmpwav = tf.name
+
+    def query_panako(pcm: bytes) -> set:
+        if len(pcm) == window_bytes:
+            header = window_header
+        else:
+            header = wav_header(len(pcm), sample_rate, channels, sampwidth)
+        with open(tmpwav, 'wb', buffering=0) as f:
+            f.write(header)
+            f.write(pcm)
+        rc, out = server.query(tmpwav, timeout=40)
+        out_low = out.lower() if out else b''
+        if automaton is None or any(sentinel in out_low for sentinel in no_match_sentinels):
+            return set()
+        return {i for _end, (i, _orig) in automaton.iter(out_low.decode('latin-1'))}
+
+    def run_query(pcm: bytes, check_no: int):
+        if olaf is not None:
+            names = olaf.query(pcm, sample_rate)
+            return check_no, {song_index[n] for n in names if n in song_index}
+        return check_no, query_panako(pcm)
+
+    # Detection state per song index.
+    last_seen = np.zeros(len(songs), dtype=np.int32)
+    miss_count = np.zeros(len(songs), dtype=np.int8)
+    is_active = np.zeros(len(songs), dtype=bool)
+    active_lock = threading.Lock()
+
+    def handle_result(fut):
+        if fut.cancelled():
+            return
+        try:
+            check_no, matched = fut.result()
+        except Exception as e:
+            on_line(f"[QUERY ERROR] {e}")
+            return
+        update_detections(check_no, matched)
+
+    def update_detections(check_no: int, matched: set):
+        with active_lock:
+            current = np.zeros(len(songs), dtype=bool)
+            for i in sorted(matched):
+                current[i] = True
+                if is_active[i]:
+                    on_line(f"DETECTED (still): {songs[i]} (check #{check_no})")
+                else:
+                    is_active[i] = True
+                    on_line(f"DETECTED: {songs[i]} (check #{check_no})")
+                last_seen[i] = check_no
+                miss_count[i] = 0
+
+            missed = is_active & ~current
+            miss_count[missed] += 1
+            ended = missed & (miss_count >= miss_threshold)
+            for i in np.flatnonzero(ended):
+                on_line(f"ENDED: {songs[i]} (last seen check #{last_seen[i]})")
+            is_active[ended] = False
+
+    # Queries run on a single worker so the loop keeps draining ffmpeg meanwhile.
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='panako-query')
+    pending = None
+    bytes_since_check = 0
     check_count = 0
 
     try:
         while not stop_event.is_set():
-            chunk = proc.stdout.read(bytes_per_second // 4)
-            if not chunk:
+            n, short = buffer.fill_from(proc.stdout)
+            if not n:
                 on_line("ffmpeg ended or no data, exiting")
                 break
-            buffer += chunk
-            if len(buffer) > window_bytes:
-                del buffer[0: len(buffer) - window_bytes]
-
-            now = time.time()
-            if now - last_check >= step_seconds:
-                last_check = now
+            bytes_since_check += n
+            if short:
+                stop_event.wait(READ_BATCH_SECONDS)
+
+            if bytes_since_check >= step_bytes:
+                bytes_since_check -= step_bytes
+                if pending is not None and not pending.done():
+                    on_line(f"[SKIP] query #{check_count} still running")
+                    continue
                 check_count += 1
-                on_line(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}] Running query #{check_count} (window {window_seconds}s)')
-
-                with tempfile.NamedTemporaryFile(prefix='panako_q_', suffix='.wav', delete=False) as tf:
-                    tmpwav = tf.name
-                try:
-                    write_wav_from_pcm(bytes(buffer), tmpwav, sample_rate, channels, sampwidth)
-                    rc, out = run_panako_query(java_bin, panako_jar, tmpwav, extra_java_args=extra_java_args, timeout=40)
-                    out_low = (out or '').lower()
-
-                    matched_tokens = set()
-                    for token, orig in zip(song_tokens, songs):
-                        if token in out_low:
-                            matched_tokens.add(orig)
-
-                    current_seen = set()
-                    if matched_tokens:
-                        for songname in matched_tokens:
-                            current_seen.add(songname)
-                            if songname not in active:
-                                active[songname] = {'last_seen': check_count, 'miss_count': 0}
-                                on_line(f"DETECTED: {songname} (check #{check_count})")
-                            else:
-                                active[songname]['last_seen'] = check_count
-                                active[songname]['miss_count'] = 0
-                                on_line(f"DETECTED (still): {songname} (check #{check_count})")
-
-                    for songname in list(active.keys()):
-                        if songname not in current_seen:
-                            active[songname]['miss_count'] += 1
-                            if active[songname]['miss_count'] >= miss_threshold:
-                                on_line(f"ENDED: {songname} (last seen check #{active[songname]['last_seen']})")
-                                del active[songname]
-                finally:
-                    try:
-                        os.unlink(tmpwav)
-                    except Exception:
-                        pass
+                pcm = buffer.view_bytes()
+                if is_silent(pcm, silence_rms_threshold):
+                    # Nothing to fingerprint; count it as a check without matches so songs can end.
+                    # It goes through the executor so it is applied after the previous check's result.
+                    on_line(f'[{log_timestamp()}] [SKIP] silent window, query #{check_count}')
+                    pending = executor.submit(lambda n=check_count: (n, set()))
+                    pending.add_done_callback(handle_result)
+                    continue
+                on_line(f'[{log_timestamp()}] Running query #{check_count} (window {window_seconds}s)')
+                pending = executor.submit(run_query, pcm, check_count)
+                pending.add_done_callback(handle_result)
 
     except KeyboardInterrupt:
         on_line('Keyboard interrupt, stopping')
@@ -151,6 +518,12 @@ def monitor_stream_loop(stream_url: str, songs_dir: str, panako_jar: str,
             proc.terminate()
         except Exception:
             pass
+        server.close()
+        executor.shutdown(wait=True, cancel_futures=True)
+        try:
+            os.unlink(tmpwav)
+        except Exception:
+            pass
         on_line("[MONITOR STOPPED]")
 
 
@@ -158,13 +531,14 @@ DEFAULT_ADD_OPENS = [
     "java.base/java.nio=ALL-UNNAMED",
     "java.base/java.lang=ALL-UNNAMED"
 ]
+DEFAULT_EXTRA_JAVA_ARGS = tuple(java_add_opens_args(DEFAULT_ADD_OPENS))
 
 def run_store_for_songs(java_bin: str, panako_jar: str, songs_dir: str, db_dir: Optional[str],
                         add_opens: Optional[List[str]] = None,
                         on_line: Callable[[str], None] = lambda s: None,
                         stop_event: threading.Event = None):
     """
-    Run Panako 'store' on all mp3 files under songs_dir, one file at a time.
+    Run Panako 'store' on all mp3 files under songs_dir in a single java process.
     Streams stdout/stderr lines to on_line callback.
 
     This avoids shell pipelines and accidental directory arguments.
@@ -172,13 +546,9 @@ def run_store_for_songs(java_bin: str, panako_jar: str, songs_dir: str, db_dir:
     if stop_event is None:
         stop_event = threading.Event()
 
-    used_add_opens = add_opens or DEFAULT_ADD_OPENS
-
-    extra_java_args = []
-    for ao in used_add_opens:
-        extra_java_args += ['--add-opens', ao]
+    extra_java_args = java_add_opens_args(add_opens) if add_opens else DEFAULT_EXTRA_JAVA_ARGS
 
-    files = sorted(Path(songs_dir).glob('**/*.mp3'))
+    files = sorted(os.path.abspath(path) for _name, path in iter_mp3s(songs_dir))
     if not files:
         on_line(f"[FINGERPRINT] No .mp3 files found in {songs_dir}")
         return
@@ -197,47 +567,74 @@ def run_store_for_songs(java_bin: str, panako_jar: str, songs_dir: str, db_dir:
             on_line(f"[FINGERPRINT ERROR] Could not create/prepare DB dir '{db_dir}': {e}")
             dbpath_str = None
 
-    for idx, p in enumerate(files, start=1):
-        if stop_event.is_set():
-            on_line("[FINGERPRINT] Stop requested, exiting")
-            break
+    # Panako's store reads a .txt file list and fingerprints it on its own pool of one thread per
+    # processor, so a single JVM covers the whole library and its startup is paid once.
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', prefix='panako_store_', suffix='.txt',
+                                     delete=False) as tf:
+        tf.write('\n'.join(files) + '\n')
+        list_path = tf.name
 
-        fpath = str(p)
-        on_line(f"[FINGERPRINT] ({idx}/{total}) Processing: {fpath}")
+    cmd = [java_bin, *extra_java_args, '-jar', str(panako_jar), 'store', list_path]
+    if dbpath_str:
+        cmd += ['-d', dbpath_str]
 
-        cmd = [java_bin] + extra_java_args + ['-jar', str(panako_jar), 'store', '-f', fpath]
-        if dbpath_str:
-            cmd += ['-d', dbpath_str]
+    on_line("[FINGERPRINT] CMD: " + " ".join(shlex.quote(x) for x in cmd))
 
-        on_line("[FINGERPRINT] CMD: " + " ".join(shlex.quote(x) for x in cmd))
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                **CHILD_POPEN_KWARGS)
+    except Exception as e:
+        on_line(f"[FINGERPRINT ERROR] failed to start java: {e}")
+        os.unlink(list_path)
+        on_line("[FINGERPRINT STOPPED]")
+        return
 
-        try:
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        except Exception as e:
-            on_line(f"[FINGERPRINT ERROR] failed to start java for {fpath}: {e}")
-            continue
+    finished = threading.Event()
 
-        try:
-            if proc.stdout:
-                for line in proc.stdout:
-                    if stop_event.is_set():
-                        break
-                    on_line(line.rstrip('\n'))
-            rc = proc.wait()
-            on_line(f"[FINGERPRINT] process exit {rc} for {fpath}")
-        except Exception as e:
-            on_line(f"[FINGERPRINT ERROR] {e}")
-        finally:
-            try:
+    def terminate_on_stop():
+        while not finished.wait(0.2):
+            if stop_event.is_set():
+                on_line("[FINGERPRINT] Stop requested, exiting")
                 proc.terminate()
-            except Exception:
-                pass
+                return
+
+    threading.Thread(target=terminate_on_stop, daemon=True).start()
+
+    # Panako's store lines name each file by its bare file name (File.getName()), both when it is
+    # stored and when it is skipped as already stored; several files may share a name.
+    remaining = collections.Counter(os.path.basename(f) for f in files)
+    done = 0
+    try:
+        if proc.stdout:
+            for line in proc.stdout:
+                line = line.rstrip('\n')
+                on_line(line)
+                for field in line.split(';'):
+                    name = field.strip()
+                    if remaining.get(name):
+                        remaining[name] -= 1
+                        done += 1
+                        on_line(f"[FINGERPRINT] ({done}/{total}) Done: {name}")
+                        break
+        rc = proc.wait()
+        on_line(f"[FINGERPRINT] process exit {rc}")
+    except Exception as e:
+        on_line(f"[FINGERPRINT ERROR] {e}")
+    finally:
+        finished.set()
+        try:
+            proc.terminate()
+        except Exception:
+            pass
+        try:
+            os.unlink(list_path)
+        except Exception:
+            pass
 
     on_line("[FINGERPRINT STOPPED]")
 
 
-class GuiSignals(QObject):
-    line = Signal(str)
+THREAD_FINISHED = "[THREAD FINISHED]"
 
 class MonitorThread(threading.Thread):
     def __init__(self, *, target, targs=(), tkwargs=None):
@@ -248,37 +645,40 @@ class MonitorThread(threading.Thread):
         self._targs = tuple(targs)
         self._tkwargs = dict(tkwargs or {})
         self.stop_event = threading.Event()
-        self.signals = GuiSignals()
+        # Output lines; the worker never blocks on the GUI, which drains them on a timer.
+        self.q: queue.SimpleQueue = queue.SimpleQueue()
 
-    def run(self):
+    def drain(self, max_lines: int) -> List[str]:
+        lines = []
         try:
-            def on_line(s: str):
-                try:
-                    self.signals.line.emit(s)
-                except Exception:
-                    print("Failed to emit signal:", s, file=sys.stderr)
+            while len(lines) < max_lines:
+                lines.append(self.q.get_nowait())
+        except queue.Empty:
+            pass
+        return lines
 
+    def run(self):
+        try:
             if 'stop_event' not in self._tkwargs:
                 self._tkwargs['stop_event'] = self.stop_event
             if 'on_line' not in self._tkwargs:
-                self._tkwargs['on_line'] = on_line
+                self._tkwargs['on_line'] = self.q.put_nowait
             self._target(*self._targs, **self._tkwargs)
 
         except Exception as e:
-            try:
-                self.signals.line.emit(f"[THREAD ERROR] {repr(e)}")
-            except Exception:
-                print("[THREAD ERROR]", repr(e), file=sys.stderr)
+            self.q.put_nowait(f"[THREAD ERROR] {repr(e)}")
         finally:
-            try:
-                self.signals.line.emit("[THREAD FINISHED]")
-            except Exception:
-                pass
+            self.q.put_nowait(THREAD_FINISHED)
 
     def stop(self):
         self.stop_event.set()
 
 
+LOG_MAX_BLOCKS = 5000
+LOG_DRAIN_INTERVAL_MS = 100
+LOG_DRAIN_MAX_LINES = 500
+THREAD_JOIN_TIMEOUT = 5.0
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -324,9 +724,10 @@ class MainWindow(QMainWindow):
 
         self.spin_window = QSpinBox(); self.spin_window.setValue(25); self.spin_window.setRange(5,120)
         self.spin_overlap = QSpinBox(); self.spin_overlap.setValue(5); self.spin_overlap.setRange(0,60)
-        self.spin_sr = QSpinBox(); self.spin_sr.setValue(44100); self.spin_sr.setRange(8000,192000)
+        self.spin_sr = QSpinBox(); self.spin_sr.setRange(8000,192000); self.spin_sr.setValue(22050)
         self.spin_channels = QSpinBox(); self.spin_channels.setValue(1); self.spin_channels.setRange(1,2)
         self.spin_miss = QSpinBox(); self.spin_miss.setValue(2); self.spin_miss.setRange(1,10)
+        self.spin_silence = QSpinBox(); self.spin_silence.setRange(0,32767); self.spin_silence.setValue(200)
 
         self.edit_add_opens = QLineEdit("java.base/java.nio=ALL-UNNAMED java.base/java.lang=ALL-UNNAMED")
 
@@ -340,6 +741,7 @@ class MainWindow(QMainWindow):
         form.addRow("Sample rate:", self.spin_sr)
         form.addRow("Channels:", self.spin_channels)
         form.addRow("Miss threshold:", self.spin_miss)
+        form.addRow("Silence RMS threshold (0 = off):", self.spin_silence)
         form.addRow("Extra --add-opens (space-separated):", self.edit_add_opens)
 
         note = QLabel("Note: Panako prints 'Skipped: resource already stored' for files it already indexed.")
@@ -366,6 +768,7 @@ class MainWindow(QMainWindow):
 
         self.fp_output = QTextEdit()
         self.fp_output.setReadOnly(True)
+        self.fp_output.document().setMaximumBlockCount(LOG_MAX_BLOCKS)
         v.addWidget(self.fp_output)
 
         w.setLayout(v)
@@ -403,6 +806,7 @@ class MainWindow(QMainWindow):
         v = QVBoxLayout()
         self.text_logs = QTextEdit()
         self.text_logs.setReadOnly(True)
+        self.text_logs.document().setMaximumBlockCount(LOG_MAX_BLOCKS)
         v.addWidget(self.text_logs)
         w.setLayout(v)
         return w
@@ -417,14 +821,35 @@ class MainWindow(QMainWindow):
         p = QFileDialog.getExistingDirectory(self, "Select DB folder", str(self.script_dir))
         if p: self.edit_db.setText(p)
 
+    def _drain_thread_lines(self, thread: MonitorThread, handler: Callable[[List[str]], None]):
+        """Poll thread's output queue every LOG_DRAIN_INTERVAL_MS and pass the lines to handler in batches."""
+        timer = QTimer(self)
+        timer.setInterval(LOG_DRAIN_INTERVAL_MS)
+
+        def drain():
+            lines = thread.drain(LOG_DRAIN_MAX_LINES)
+            if not lines:
+                return
+            handler(lines)
+            if THREAD_FINISHED in lines:
+                timer.stop()
+                timer.deleteLater()
+
+        timer.timeout.connect(drain)
+        timer.start()
+
     def _append_log(self, txt: str):
-        ts = time.strftime("%Y-%m-%d %H:%M:%S")
-        self.text_logs.append(f"[{ts}] {txt}")
+        self._append_logs([txt])
+
+    def _append_logs(self, lines: List[str]):
+        ts = log_timestamp()
+        self.text_logs.append('\n'.join(f"[{ts}] {txt}" for txt in lines))
 
-    def _on_line(self, line: str):
-        if 'DETECTED:' in line or 'DETECTED (still):' in line or 'ENDED:' in line:
-            self.list_detect.addItem(line)
-        self._append_log(line)
+    def _on_lines(self, lines: List[str]):
+        for line in lines:
+            if 'DETECTED:' in line or 'DETECTED (still):' in line or 'ENDED:' in line:
+                self.list_detect.addItem(line)
+        self._append_logs(lines)
 
 
     def start_monitor(self):
@@ -458,6 +883,7 @@ class MainWindow(QMainWindow):
         sr = int(self.spin_sr.value())
         channels = int(self.spin_channels.value())
         miss = int(self.spin_miss.value())
+        silence = int(self.spin_silence.value())
         add_opens = [x for x in (self.edit_add_opens.text().strip().split()) if x] or DEFAULT_ADD_OPENS
 
         try:
@@ -473,15 +899,16 @@ class MainWindow(QMainWindow):
                     'window_seconds': window,
                     'overlap_seconds': overlap,
                     'add_opens': add_opens,
-                    'miss_threshold': miss
+                    'miss_threshold': miss,
+                    'silence_rms_threshold': silence
                 }
             )
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to create monitor thread: {e}")
             return
 
-        self.monitor_thread.signals.line.connect(self._on_line)
         self.monitor_thread.start()
+        self._drain_thread_lines(self.monitor_thread, self._on_lines)
 
         self.btn_start.setEnabled(False)
         self.btn_stop.setEnabled(True)
@@ -535,11 +962,10 @@ class MainWindow(QMainWindow):
 
         self.fp_output.clear()
 
-        def on_fp_line(line: str):
-            low = (line or '').lower()
+        def on_fp_lines(lines: List[str]):
             if not only_summary:
-                self.fp_output.append(line)
-            self._append_log("[FP] " + line)
+                self.fp_output.append('\n'.join(lines))
+            self._append_logs(["[FP] " + line for line in lines])
 
         try:
             self.fingerprint_thread = MonitorThread(
@@ -553,8 +979,8 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Error", f"Failed to create fingerprint thread: {e}")
             return
 
-        self.fingerprint_thread.signals.line.connect(on_fp_line)
         self.fingerprint_thread.start()
+        self._drain_thread_lines(self.fingerprint_thread, on_fp_lines)
 
         self.btn_start_fp.setEnabled(False)
         self.btn_stop_fp.setEnabled(True)
@@ -564,6 +990,16 @@ class MainWindow(QMainWindow):
             self.fingerprint_thread.stop()
             self.btn_stop_fp.setEnabled(False)
 
+    def closeEvent(self, event):
+        # ffmpeg and java run in their own session, so they would outlive the window
+        # unless the worker threads get to terminate them first.
+        threads = [t for t in (self.monitor_thread, self.fingerprint_thread) if t is not None]
+        for t in threads:
+            t.stop()
+        for t in threads:
+            t.join(timeout=THREAD_JOIN_TIMEOUT)
+        super().closeEvent(event)
+
 
 def main():
     app = QApplication(sys.argv)